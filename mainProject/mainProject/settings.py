@@ -61,6 +61,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "medsite.middleware.ReplicaPinMiddleware",
 ]
 
 
@@ -96,13 +97,86 @@ WSGI_APPLICATION = 'mainProject.wsgi.application'
 
 
 
+# Tuning via env:
+#   DB_POOL=true             -> psycopg 3 connection pool (Postgres only)
+#   DB_POOL_MIN_SIZE/MAX_SIZE -> pool size *per worker process*; MAX_SIZE
+#                               defaults to GUNICORN_THREADS (one per thread)
+#   DB_POOL_TIMEOUT          -> seconds to wait for a free connection
+#   SQLITE_TUNED=false       -> plain SQLite (default is WAL + busy_timeout)
+DB_POOL = os.getenv("DB_POOL", "False").lower() == "true"
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", os.getenv("GUNICORN_THREADS", "4")))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+SQLITE_TUNED = os.getenv("SQLITE_TUNED", "True").lower() == "true"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(128 * 1024 * 1024)))
+
+
+def database_config(url):
+    db = dj_database_url.parse(url, conn_max_age=600, conn_health_checks=True)
+    options = db.setdefault("OPTIONS", {})
+
+    if db["ENGINE"] == "django.db.backends.postgresql" and DB_POOL:
+        # Django's pool hands connections back on request end, so persistent
+        # connections must be off. CONN_HEALTH_CHECKS makes Django pass
+        # ConnectionPool.check_connection to the pool itself.
+        db["CONN_MAX_AGE"] = 0
+        db["CONN_HEALTH_CHECKS"] = True
+        options["pool"] = {
+            "min_size": DB_POOL_MIN_SIZE,
+            "max_size": max(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE),
+            "timeout": DB_POOL_TIMEOUT,
+        }
+
+    elif db["ENGINE"] == "django.db.backends.sqlite3" and SQLITE_TUNED:
+        # WAL lets the monitor pages read while the device is writing;
+        # IMMEDIATE takes the write lock up front so busy_timeout applies
+        # instead of failing with "database is locked" on lock upgrade.
+        options["transaction_mode"] = "IMMEDIATE"
+        options["timeout"] = SQLITE_BUSY_TIMEOUT_MS / 1000
+        options["init_command"] = (
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA synchronous=NORMAL;"
+            f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS};"
+            f"PRAGMA mmap_size={SQLITE_MMAP_SIZE};"
+        )
+
+    return db
+
+
 DATABASES = {
-    "default": dj_database_url.config(
-        default=os.getenv("DATABASE_URL", "sqlite:///db.sqlite3"),
-        conn_max_age=600,
-    )
+    "default": database_config(os.getenv("DATABASE_URL", "sqlite:///db.sqlite3")),
 }
 
+# Optional read replica for monitor/dashboard reads (see medsite/routers.py).
+# For local testing point it at a second SQLite file and run
+# `manage.py migrate --database=replica`.
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL", "").strip()
+# A replica is trusted for up to MAX_LAG + CHECK_INTERVAL seconds behind; keep
+# that well under the 5 s "Machine unavailable" window of the latest APIs.
+# The check interval is capped at MAX_LAG in medsite/routers.py.
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "2"))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "1"))
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "10"))
+
+if REPLICA_DATABASE_URL:
+    DATABASES["replica"] = database_config(REPLICA_DATABASE_URL)
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+    DATABASE_ROUTERS = ["medsite.routers.PrimaryReplicaRouter"]
+
+
+# JSON codec for the vitals APIs: auto | orjson | msgspec | json (medsite/jsoncodec.py)
+MEDSITE_JSON_BACKEND = os.getenv("MEDSITE_JSON_BACKEND", "auto")
+
+
+# Background jobs (medsite/jobs.py, `manage.py run_workers`)
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1"))
+JOBS_HEARTBEAT_SECONDS = float(os.getenv("JOBS_HEARTBEAT_SECONDS", "30"))
+JOBS_STALE_SECONDS = int(os.getenv("JOBS_STALE_SECONDS", "300"))  # no heartbeat for this long = dead worker
+JOBS_RETRY_BACKOFF = int(os.getenv("JOBS_RETRY_BACKOFF", "10"))
+JOBS_KEEP_DAYS = int(os.getenv("JOBS_KEEP_DAYS", "7"))
+READINGS_RETENTION_DAYS = int(os.getenv("READINGS_RETENTION_DAYS", "0"))  # 0 = keep forever
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Patient, Reading
+from .models import Job, Patient, Reading
 
 @admin.register(Patient)
 class PatientAdmin(admin.ModelAdmin):
@@ -17,3 +17,10 @@ class PatientAdmin(admin.ModelAdmin):
 class ReadingAdmin(admin.ModelAdmin):
     list_display = ("created_at", "patient", "finger", "bpm", "spo2", "temp")
     ordering = ("-created_at",)
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "status", "attempts", "run_at", "started_at", "finished_at")
+    list_filter = ("status", "name")
+    search_fields = ("name", "unique_key")
+    ordering = ("-run_at",)
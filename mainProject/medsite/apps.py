@@ -5,4 +5,4 @@ class MedsiteConfig(AppConfig):
     name = "medsite"
 
     def ready(self):
-        pass
+        from . import tasks  # noqa: F401  registers background jobs
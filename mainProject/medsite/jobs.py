@@ -0,0 +1,311 @@
+# medsite/jobs.py
+"""
+Small DB-backed job queue. No broker: jobs are rows in medsite.Job and are
+processed by `manage.py run_workers`.
+
+    from medsite.jobs import job, enqueue
+
+    @job("medsite.export_patient", max_attempts=5)
+    def export_patient(patient_id):
+        ...
+
+    enqueue("medsite.export_patient", {"patient_id": p.id})
+
+Periodic jobs are registered with `every=<seconds>`; the worker enqueues one
+run per time slot.
+"""
+import logging
+import threading
+import traceback
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections, router, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+STALE_ERROR = "Worker timed out"
+
+
+@dataclass
+class JobSpec:
+    name: str
+    func: Callable
+    max_attempts: int = 3
+    every: float | None = None
+
+
+_registry = {}
+
+
+def job(name, max_attempts=3, every=None):
+    """Register a function as a job handler. It is called with the payload as kwargs."""
+
+    def decorator(func):
+        _registry[name] = JobSpec(name=name, func=func, max_attempts=max_attempts, every=every)
+        return func
+
+    return decorator
+
+
+def registered_jobs():
+    return dict(_registry)
+
+
+def _db():
+    return router.db_for_write(Job)
+
+
+# ---------------- enqueue ----------------
+def enqueue(name, payload=None, run_at=None, delay=0, max_attempts=None, unique_key=None):
+    """
+    Queue a job and return the Job row. With `unique_key`, returns None if a
+    job with that key already exists.
+    """
+    spec = _registry.get(name)
+    if spec is None:
+        raise ValueError(f"Unknown job {name!r}")
+
+    run_at = run_at or timezone.now()
+    if delay:
+        run_at += timedelta(seconds=delay)
+
+    try:
+        with transaction.atomic(using=_db()):
+            return Job.objects.create(
+                name=name,
+                payload=payload or {},
+                run_at=run_at,
+                max_attempts=max_attempts or spec.max_attempts,
+                unique_key=unique_key,
+            )
+    except IntegrityError:
+        if unique_key is None:
+            raise
+        return None
+
+
+def schedule_periodic(now=None, last_slots=None):
+    """
+    Enqueue the current slot of every periodic job. Safe to call from many
+    workers. Pass the same `last_slots` dict on every call (the worker does)
+    so the database is only touched when a slot changes.
+    """
+    now = now or timezone.now()
+    last_slots = {} if last_slots is None else last_slots
+    created = 0
+    for spec in _registry.values():
+        if not spec.every:
+            continue
+        slot = int(now.timestamp() // spec.every)
+        if last_slots.get(spec.name) == slot:
+            continue
+
+        key = f"{spec.name}@{slot}"
+        # check first so the unique constraint only fires on a real race
+        # between hosts, not on every call
+        if not Job.objects.using(_db()).filter(unique_key=key).exists():
+            if enqueue(spec.name, run_at=now, unique_key=key):
+                created += 1
+        last_slots[spec.name] = slot
+    return created
+
+
+# ---------------- dequeue / run ----------------
+def claim(worker_id):
+    """
+    Take the next due job and mark it running. Uses
+    SELECT ... FOR UPDATE SKIP LOCKED where supported (Postgres); otherwise
+    (SQLite) claims with a conditional UPDATE so two workers can't both win.
+    """
+    db = _db()
+    now = timezone.now()
+    due = (Job.objects.using(db)
+        .filter(status=Job.QUEUED, run_at__lte=now)
+        .order_by("run_at", "id")
+    )
+
+    if connections[db].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=db):
+            j = due.select_for_update(skip_locked=True).first()
+            if j is None:
+                return None
+            j.status = Job.RUNNING
+            j.attempts += 1
+            j.started_at = now
+            j.heartbeat_at = now
+            j.locked_by = worker_id
+            j.save(update_fields=["status", "attempts", "started_at", "heartbeat_at", "locked_by"])
+            return j
+
+    for pk in due.values_list("pk", flat=True)[:10]:
+        claimed = Job.objects.using(db).filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            attempts=F("attempts") + 1,
+            started_at=now,
+            heartbeat_at=now,
+            locked_by=worker_id,
+        )
+        if claimed:
+            return Job.objects.using(db).get(pk=pk)
+    return None
+
+
+def retry_delay(attempts):
+    base = getattr(settings, "JOBS_RETRY_BACKOFF", 10)
+    return min(base * 2 ** (attempts - 1), 3600)
+
+
+class Heartbeat(threading.Thread):
+    """Refreshes heartbeat_at on the running job's row every `interval` seconds."""
+
+    def __init__(self, rows, interval):
+        super().__init__(daemon=True)
+        self.rows = rows
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                self.rows.update(heartbeat_at=timezone.now())
+        except DatabaseError:
+            logger.exception("Job heartbeat failed")
+        finally:
+            # only this thread's connections
+            connections.close_all()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run(j):
+    """Run a claimed job and record the outcome (done, retry later, or failed)."""
+    # Only touch the row while we still own it: if requeue_stale() handed the
+    # job to another worker, that worker's bookkeeping wins.
+    rows = Job.objects.using(_db()).filter(
+        pk=j.pk, status=Job.RUNNING, locked_by=j.locked_by, attempts=j.attempts,
+    )
+    spec = _registry.get(j.name)
+
+    heartbeat = None
+    interval = getattr(settings, "JOBS_HEARTBEAT_SECONDS", 30)
+    if interval and interval > 0:
+        heartbeat = Heartbeat(rows, interval)
+        heartbeat.start()
+
+    try:
+        if spec is None:
+            raise LookupError(f"No handler registered for job {j.name!r}")
+        spec.func(**j.payload)
+    except Exception:
+        logger.exception("Job %s failed (attempt %s/%s)", j, j.attempts, j.max_attempts)
+        if heartbeat:
+            heartbeat.stop()
+        now = timezone.now()
+        if j.attempts < j.max_attempts:
+            updated = rows.update(
+                status=Job.QUEUED,
+                run_at=now + timedelta(seconds=retry_delay(j.attempts)),
+                last_error=traceback.format_exc(),
+                locked_by="",
+            )
+        else:
+            updated = rows.update(
+                status=Job.FAILED,
+                finished_at=now,
+                last_error=traceback.format_exc(),
+            )
+        _warn_if_lost(j, updated)
+        return False
+
+    if heartbeat:
+        heartbeat.stop()
+    now = timezone.now()
+    updated = rows.update(status=Job.DONE, finished_at=now)
+    if not updated:
+        # Failed by requeue_stale() on its last attempt but it did finish:
+        # the result is still ours to record.
+        updated = Job.objects.using(_db()).filter(
+            pk=j.pk, status=Job.FAILED, locked_by=j.locked_by, attempts=j.attempts,
+            last_error=STALE_ERROR,
+        ).update(status=Job.DONE, finished_at=now, last_error="")
+    _warn_if_lost(j, updated)
+    return True
+
+
+def _warn_if_lost(j, updated):
+    if not updated:
+        logger.warning(
+            "Job %s was taken over while %s ran it (requeued as stale?); result not recorded",
+            j, j.locked_by,
+        )
+
+
+def requeue_stale(timeout=None):
+    """
+    Give jobs back to the queue if their worker died mid-run, i.e. no
+    heartbeat for `timeout` seconds (JOBS_STALE_SECONDS). Long jobs on a live
+    worker keep heartbeating and are left alone.
+    """
+    timeout = timeout or getattr(settings, "JOBS_STALE_SECONDS", 300)
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    stale = Job.objects.using(_db()).filter(status=Job.RUNNING).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    )
+
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.FAILED, finished_at=timezone.now(), last_error=STALE_ERROR,
+    )
+    requeued = stale.update(status=Job.QUEUED, locked_by="", last_error=STALE_ERROR)
+    return requeued + failed
+
+
+# ---------------- stats ----------------
+def _percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def stats(window=3600):
+    """
+    Queue depth per status plus wait (run_at -> started) and run
+    (started -> finished) latency for jobs finished in the last `window` seconds.
+    """
+    db = _db()
+    now = timezone.now()
+    jobs = Job.objects.using(db)
+
+    by_status = dict(jobs.order_by().values_list("status").annotate(n=Count("id")))
+    oldest_due = (jobs
+        .filter(status=Job.QUEUED, run_at__lte=now)
+        .order_by("run_at")
+        .values_list("run_at", flat=True)
+        .first()
+    )
+
+    recent = list(jobs
+        .filter(status=Job.DONE, finished_at__gte=now - timedelta(seconds=window))
+        .values_list("run_at", "started_at", "finished_at")[:5000]
+    )
+    wait = [(s - r).total_seconds() for r, s, f in recent]
+    run_time = [(f - s).total_seconds() for r, s, f in recent]
+
+    return {
+        "depth": {status: by_status.get(status, 0) for status, _ in Job.STATUS_CHOICES},
+        "oldest_due_age": (now - oldest_due).total_seconds() if oldest_due else 0,
+        "finished_last_window": len(recent),
+        "wait_p50": _percentile(wait, 0.5),
+        "wait_p95": _percentile(wait, 0.95),
+        "run_p50": _percentile(run_time, 0.5),
+        "run_p95": _percentile(run_time, 0.95),
+    }
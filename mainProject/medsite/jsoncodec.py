@@ -0,0 +1,211 @@
+# medsite/jsoncodec.py
+"""
+Fast JSON encode/decode for the vitals APIs.
+
+Uses the fastest encoder that is installed (orjson, then msgspec, then the
+stdlib json module), or the one named by settings.MEDSITE_JSON_BACKEND.
+Everything works on bytes so request bodies can be parsed without decoding
+to str first.
+"""
+import gzip
+import json
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - optional dependency
+    msgspec = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+# Field sets returned by the "latest" APIs.
+READING_FIELDS = (
+    "created_at", "ir", "red", "finger",
+    "bpm", "spo2", "pi", "rr", "sbp", "dbp", "temp",
+)
+PUBLIC_READING_FIELDS = (
+    "created_at", "ir", "red", "finger",
+    "bpm", "spo2", "sbp", "dbp", "temp",
+)
+
+# Short column names for the column-oriented shape.
+COLUMN_NAMES = {"created_at": "t"}
+
+# Bodies smaller than this are not worth compressing.
+COMPRESS_MIN_LENGTH = 512
+
+
+# ---------------- encode / decode ----------------
+def _default(obj):
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class Backend:
+    def __init__(self, name, dumps, loads):
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+
+
+def _orjson_backend():
+    return Backend("orjson", lambda obj: orjson.dumps(obj, default=_default), orjson.loads)
+
+
+def _msgspec_backend():
+    # note: msgspec writes UTC datetimes as "...Z" rather than "+00:00"
+    encoder = msgspec.json.Encoder(enc_hook=_default)
+    decoder = msgspec.json.Decoder()
+    return Backend("msgspec", encoder.encode, decoder.decode)
+
+
+def _json_backend():
+    def dumps(obj):
+        return json.dumps(obj, default=_default, separators=(",", ":")).encode("utf-8")
+
+    # json.loads detects the encoding of bytes itself, no decode() copy needed
+    return Backend("json", dumps, json.loads)
+
+
+BACKENDS = {
+    "orjson": (lambda: orjson is not None, _orjson_backend),
+    "msgspec": (lambda: msgspec is not None, _msgspec_backend),
+    "json": (lambda: True, _json_backend),
+}
+
+_backend = None
+
+
+def get_backend():
+    """
+    The codec picked by settings.MEDSITE_JSON_BACKEND: "auto" (default) uses
+    the first installed of orjson, msgspec, json; a name forces that codec.
+    """
+    global _backend
+    if _backend is None:
+        name = getattr(settings, "MEDSITE_JSON_BACKEND", "auto")
+        if name == "auto":
+            name = next(n for n, (available, _) in BACKENDS.items() if available())
+        if name not in BACKENDS:
+            raise ImproperlyConfigured(
+                f"MEDSITE_JSON_BACKEND must be one of auto, {', '.join(BACKENDS)}; got {name!r}"
+            )
+        available, factory = BACKENDS[name]
+        if not available():
+            raise ImproperlyConfigured(f"MEDSITE_JSON_BACKEND={name!r} but {name} is not installed")
+        _backend = factory()
+    return _backend
+
+
+@receiver(setting_changed)
+def _reset_backend(setting, **kwargs):
+    global _backend
+    if setting == "MEDSITE_JSON_BACKEND":
+        _backend = None
+
+
+def dumps(obj):
+    return get_backend().dumps(obj)
+
+
+def loads(data):
+    return get_backend().loads(data)
+
+
+# ---------------- row shapes ----------------
+def reading_to_dict(r, fields=READING_FIELDS):
+    return {f: getattr(r, f) for f in fields}
+
+
+def readings_to_rows(readings, fields=READING_FIELDS):
+    return [reading_to_dict(r, fields) for r in readings]
+
+
+def readings_to_columns(readings, fields=READING_FIELDS):
+    """
+    Column-oriented shape for multi-row payloads:
+    {"t": [...], "bpm": [...], ...}. Much smaller than a list of
+    objects because each key is written once.
+    """
+    cols = {f: [] for f in fields}
+    for r in readings:
+        for f in fields:
+            cols[f].append(getattr(r, f))
+    return {COLUMN_NAMES.get(f, f): v for f, v in cols.items()}
+
+
+# ---------------- responses ----------------
+def _accepted_encodings(request):
+    header = request.headers.get("Accept-Encoding", "")
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        key, _, value = params.strip().partition("=")
+        if key.strip() == "q":
+            try:
+                q = float(value)
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            accepted.add(name)
+    return accepted
+
+
+def compress_response(request, response, min_length=COMPRESS_MIN_LENGTH):
+    """
+    Compress the response body with brotli or gzip based on Accept-Encoding.
+    Small bodies and already-encoded responses are left untouched.
+    """
+    if response.streaming or response.has_header("Content-Encoding"):
+        return response
+
+    patch_vary_headers(response, ("Accept-Encoding",))
+    if len(response.content) < min_length:
+        return response
+
+    accepted = _accepted_encodings(request)
+    if brotli is not None and "br" in accepted:
+        body, encoding = brotli.compress(response.content), "br"
+    elif "gzip" in accepted:
+        body, encoding = gzip.compress(response.content, compresslevel=6, mtime=0), "gzip"
+    else:
+        return response
+
+    if len(body) >= len(response.content):
+        return response
+
+    response.content = body
+    response["Content-Length"] = str(len(body))
+    response["Content-Encoding"] = encoding
+    return response
+
+
+class FastJsonResponse(HttpResponse):
+    """
+    Drop-in for JsonResponse that encodes with the configured backend.
+    Pass `request` to negotiate gzip/brotli compression.
+    """
+
+    def __init__(self, data, request=None, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(content=dumps(data), **kwargs)
+        if request is not None:
+            compress_response(request, self)
@@ -0,0 +1,77 @@
+# medsite/management/commands/bench_codec.py
+import json
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from medsite import jsoncodec
+
+
+def _fake_readings(n):
+    start = timezone.now()
+    return [
+        SimpleNamespace(
+            created_at=start + timedelta(seconds=i),
+            ir=120000 + i, red=95000 + i, finger=True,
+            bpm=72 + i % 10, spo2=97.5, pi=3.2, rr=16.0,
+            sbp=120, dbp=80, temp=36.7,
+        )
+        for i in range(n)
+    ]
+
+
+def _best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class Command(BaseCommand):
+    help = "Microbenchmark JSON encode/decode of vitals rows (stdlib vs medsite.jsoncodec)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **opts):
+        n, repeat = opts["rows"], opts["repeat"]
+        readings = _fake_readings(n)
+
+        def stdlib_rows():
+            return [
+                {
+                    "created_at": r.created_at.isoformat(),
+                    "ir": r.ir, "red": r.red, "finger": r.finger,
+                    "bpm": r.bpm, "spo2": r.spo2, "pi": r.pi, "rr": r.rr,
+                    "sbp": r.sbp, "dbp": r.dbp, "temp": r.temp,
+                }
+                for r in readings
+            ]
+
+        cases = [
+            ("stdlib json, rows", lambda: json.dumps(stdlib_rows()).encode("utf-8"),
+             lambda b: json.loads(b.decode("utf-8"))),
+            (f"{jsoncodec.get_backend().name}, rows",
+             lambda: jsoncodec.dumps(jsoncodec.readings_to_rows(readings)),
+             jsoncodec.loads),
+            (f"{jsoncodec.get_backend().name}, columns",
+             lambda: jsoncodec.dumps(jsoncodec.readings_to_columns(readings)),
+             jsoncodec.loads),
+        ]
+
+        self.stdout.write(f"{n} rows, best of {repeat}")
+        for label, encode, decode in cases:
+            body = encode()
+            enc = _best_of(encode, repeat)
+            dec = _best_of(lambda: decode(body), repeat)
+            self.stdout.write(
+                f"  {label:<20} encode {enc * 1000:8.2f} ms  "
+                f"decode {dec * 1000:8.2f} ms  size {len(body) / 1024:8.1f} KiB"
+            )
@@ -0,0 +1,87 @@
+# medsite/management/commands/bench_ingest.py
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.test import Client
+
+from medsite.models import Patient
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure /api/ingest/ throughput against the configured database. "
+        "WARNING: writes a temporary patient and its readings to the database "
+        "DATABASE_URL points at; don't run it against production. "
+        "Run once per setting (e.g. DB_POOL=true, SQLITE_TUNED=false) to compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="total ingest requests")
+        parser.add_argument("--threads", type=int, default=8, help="concurrent writers")
+        parser.add_argument("--keep", action="store_true", help="keep the benchmark patient and readings")
+
+    def handle(self, *args, **opts):
+        patient = Patient.objects.create(name="bench_ingest")
+        try:
+            self.bench(patient, opts["requests"], opts["threads"])
+        finally:
+            if not opts["keep"]:
+                patient.delete()
+
+    def bench(self, patient, total, threads):
+        body = b'{"ir":120000,"red":95000,"finger":true,"bpm":72,"spo2":97.5,"temp":36.7}'
+
+        per_thread = [total // threads + (1 if i < total % threads else 0) for i in range(threads)]
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def worker(n):
+            client = Client()
+            local = []
+            try:
+                for _ in range(n):
+                    t0 = time.perf_counter()
+                    r = client.post(
+                        "/api/ingest/", data=body, content_type="application/json",
+                        headers={"X-PUBLIC-CODE": patient.public_code},
+                    )
+                    local.append(time.perf_counter() - t0)
+                    if r.status_code != 200:
+                        with lock:
+                            errors.append(r.status_code)
+                    # mimic request_finished: return/close the connection
+                    close_old_connections()
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+            finally:
+                connection.close()
+                with lock:
+                    latencies.extend(local)
+
+        workers = [threading.Thread(target=worker, args=(n,)) for n in per_thread]
+        t0 = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        elapsed = time.perf_counter() - t0
+
+        db = settings.DATABASES["default"]
+        mode = "pooled" if db.get("OPTIONS", {}).get("pool") else f"conn_max_age={db.get('CONN_MAX_AGE')}"
+        if db["ENGINE"].endswith("sqlite3"):
+            mode = "sqlite tuned" if "init_command" in db.get("OPTIONS", {}) else "sqlite default"
+
+        latencies.sort()
+        self.stdout.write(f"{db['ENGINE']} ({mode}), {threads} threads")
+        self.stdout.write(f"  {len(latencies)} requests in {elapsed:.2f}s -> {len(latencies) / elapsed:.1f} req/s")
+        if latencies:
+            p50 = latencies[len(latencies) // 2]
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            self.stdout.write(f"  latency p50 {p50 * 1000:.1f} ms  p99 {p99 * 1000:.1f} ms")
+        if errors:
+            self.stdout.write(self.style.WARNING(f"  {len(errors)} errors, e.g. {errors[0]}"))
@@ -0,0 +1,15 @@
+# medsite/management/commands/job_stats.py
+from django.core.management.base import BaseCommand
+
+from medsite import jobs
+from medsite.jsoncodec import dumps
+
+
+class Command(BaseCommand):
+    help = "Print background job queue depth and latency stats as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--window", type=int, default=3600, help="latency window in seconds")
+
+    def handle(self, *args, **opts):
+        self.stdout.write(dumps(jobs.stats(window=opts["window"])).decode("utf-8"))
@@ -0,0 +1,130 @@
+# medsite/management/commands/run_workers.py
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from medsite import jobs
+from medsite.jsoncodec import dumps
+
+logger = logging.getLogger("medsite.jobs")
+
+
+def _work_loop(worker_id, stop, poll_interval, burst):
+    try:
+        while not stop.is_set():
+            j = jobs.claim(worker_id)
+            if j is None:
+                if burst:
+                    break
+                stop.wait(poll_interval)
+                continue
+            jobs.run(j)
+            close_old_connections()
+    finally:
+        connections.close_all()
+
+
+def _run_threads(prefix, threads, stop, poll_interval, burst):
+    pool = [
+        threading.Thread(
+            target=_work_loop,
+            args=(f"{prefix}-t{i}", stop, poll_interval, burst),
+            name=f"{prefix}-t{i}",
+            daemon=True,
+        )
+        for i in range(threads)
+    ]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+
+def _child_main(prefix, threads, poll_interval, burst):
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    _run_threads(prefix, threads, stop, poll_interval, burst)
+
+
+class Command(BaseCommand):
+    help = "Process background jobs from the medsite job table (no broker needed)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=4, help="worker threads per process")
+        parser.add_argument("--processes", type=int, default=1, help="worker processes")
+        parser.add_argument("--poll-interval", type=float, default=None)
+        parser.add_argument("--stats-interval", type=float, default=60, help="seconds between job stats lines on stdout (0 = off)")
+        parser.add_argument("--burst", action="store_true", help="exit once the queue is empty")
+
+    def handle(self, *args, **opts):
+        threads = max(1, opts["threads"])
+        processes = max(1, opts["processes"])
+        poll = opts["poll_interval"] or getattr(settings, "JOBS_POLL_INTERVAL", 1)
+        burst = opts["burst"]
+        prefix = f"{socket.gethostname()}-{os.getpid()}"
+
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+        last_slots = {}
+        jobs.requeue_stale()
+        jobs.schedule_periodic(last_slots=last_slots)
+        self.stdout.write(
+            f"run_workers: {processes} process(es) x {threads} thread(s), "
+            f"{len(jobs.registered_jobs())} job type(s) registered"
+        )
+
+        children = []
+        if processes > 1:
+            # connections must not be shared across fork()
+            connections.close_all()
+            ctx = multiprocessing.get_context("fork")
+            for p in range(processes):
+                child = ctx.Process(
+                    target=_child_main,
+                    args=(f"{prefix}-p{p}", threads, poll, burst),
+                    daemon=False,
+                )
+                child.start()
+                children.append(child)
+            workers = None
+        else:
+            workers = threading.Thread(
+                target=_run_threads, args=(prefix, threads, stop, poll, burst), daemon=True,
+            )
+            workers.start()
+
+        # main thread: periodic schedules, stale-job recovery, stats
+        ticks = 0
+        while not stop.wait(poll):
+            if burst and not any(c.is_alive() for c in children) and not (workers and workers.is_alive()):
+                break
+            ticks += 1
+            try:
+                jobs.schedule_periodic(last_slots=last_slots)
+                if ticks % 60 == 0:
+                    jobs.requeue_stale()
+                if opts["stats_interval"] and ticks % max(1, int(opts["stats_interval"] / poll)) == 0:
+                    self.stdout.write(f"job stats: {dumps(jobs.stats()).decode('utf-8')}")
+            except Exception:
+                logger.exception("run_workers scheduler tick failed")
+            finally:
+                close_old_connections()
+
+        stop.set()
+        for c in children:
+            c.terminate()
+            c.join()
+        if workers:
+            workers.join()
+        connections.close_all()
+        self.stdout.write("run_workers: stopped")
@@ -0,0 +1,32 @@
+# medsite/middleware.py
+from django.conf import settings
+
+from .routers import PIN_COOKIE, replica_configured
+
+
+class ReplicaPinMiddleware:
+    """
+    After a successful write (POST/PUT/PATCH/DELETE), pin the client to the
+    primary for REPLICA_PIN_SECONDS so the next page, e.g. home() right after
+    create_patient, reads its own writes instead of a lagging replica.
+    """
+
+    UNSAFE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if (
+            replica_configured()
+            and request.method in self.UNSAFE_METHODS
+            and response.status_code < 400
+        ):
+            response.set_cookie(
+                PIN_COOKIE, "1",
+                max_age=getattr(settings, "REPLICA_PIN_SECONDS", 10),
+                httponly=True, samesite="Lax",
+            )
+        return response
@@ -0,0 +1,134 @@
+# medsite/routers.py
+"""
+Primary/replica routing.
+
+Writes always go to "default". Reads go to "replica" only inside views
+wrapped with @replica_reads, only when the client has not just written
+(see ReplicaPinMiddleware), and only while the replica is not lagging.
+Without a "replica" alias in DATABASES everything stays on "default".
+"""
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import Max
+from django.utils import timezone
+
+PRIMARY = "default"
+REPLICA = "replica"
+PIN_COOKIE = "db_pin"
+
+_use_replica = ContextVar("medsite_use_replica", default=False)
+
+# per-process cache: (checked_at, lag_seconds)
+_lag_cache = {"checked_at": 0.0, "lag": None}
+
+
+def reset_lag_cache():
+    _lag_cache["checked_at"] = 0.0
+    _lag_cache["lag"] = None
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def replica_lag():
+    """
+    Replication lag of the replica in seconds, or None if it can't be read.
+    Cached per process for REPLICA_LAG_CHECK_INTERVAL seconds (capped at
+    REPLICA_MAX_LAG_SECONDS).
+    """
+    now = time.monotonic()
+    max_lag = getattr(settings, "REPLICA_MAX_LAG_SECONDS", 2)
+    # A cached value can be up to `interval` old, so the replica may really be
+    # up to max_lag + interval behind; never cache longer than max_lag.
+    interval = min(getattr(settings, "REPLICA_LAG_CHECK_INTERVAL", 1), max_lag)
+    if now - _lag_cache["checked_at"] < interval:
+        return _lag_cache["lag"]
+
+    conn = connections[REPLICA]
+    try:
+        if conn.vendor == "postgresql":
+            # 0 on a primary or a standby that has replayed everything it
+            # received (so an idle, caught-up replica stays usable); otherwise
+            # time since the last replayed transaction. NULL (nothing replayed
+            # yet) means unknown -> unhealthy.
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+                    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+                )
+                value = cur.fetchone()[0]
+            lag = None if value is None else float(value)
+        else:
+            # e.g. a second SQLite file for local testing, or MySQL
+            lag = reading_lag()
+    except DatabaseError:
+        lag = None
+
+    _lag_cache["checked_at"] = now
+    _lag_cache["lag"] = lag
+    return lag
+
+
+def reading_lag():
+    """
+    Backend-independent lag: how long the oldest Reading that is on the
+    primary but not yet on the replica has been waiting. Both lookups use
+    the primary key index. Used for SQLite/MySQL replicas.
+    """
+    from .models import Reading
+
+    replica_last = Reading.objects.using(REPLICA).aggregate(m=Max("id"))["m"] or 0
+    oldest_missing = (Reading.objects.using(PRIMARY)
+        .filter(id__gt=replica_last)
+        .order_by("id")
+        .values_list("created_at", flat=True)
+        .first()
+    )
+    if oldest_missing is None:
+        return 0.0
+    return max(0.0, (timezone.now() - oldest_missing).total_seconds())
+
+
+def replica_healthy():
+    lag = replica_lag()
+    return lag is not None and lag <= getattr(settings, "REPLICA_MAX_LAG_SECONDS", 2)
+
+
+def replica_reads(view):
+    """Send this view's ORM reads to the replica when it is safe to."""
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if not replica_configured() or request.COOKIES.get(PIN_COOKIE):
+            return view(request, *args, **kwargs)
+
+        token = _use_replica.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+
+    return wrapped
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_healthy():
+            return REPLICA
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # same data on both aliases
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
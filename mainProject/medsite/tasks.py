@@ -0,0 +1,36 @@
+# medsite/tasks.py
+# Built-in background jobs. Imported from MedsiteConfig.ready() so the
+# handlers are registered in every process (web and workers).
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .jobs import job
+from .models import Job, Reading
+
+
+@job("medsite.purge_jobs", every=3600)
+def purge_jobs():
+    """Drop finished job rows older than JOBS_KEEP_DAYS."""
+    cutoff = timezone.now() - timedelta(days=getattr(settings, "JOBS_KEEP_DAYS", 7))
+    Job.objects.filter(status__in=[Job.DONE, Job.FAILED], finished_at__lt=cutoff).delete()
+
+
+@job("medsite.prune_readings", every=3600)
+def prune_readings(batch_size=5000):
+    """Retention: delete readings older than READINGS_RETENTION_DAYS (0 keeps everything)."""
+    days = getattr(settings, "READINGS_RETENTION_DAYS", 0)
+    if not days:
+        return
+
+    cutoff = timezone.now() - timedelta(days=days)
+    # delete in batches so one run never holds a huge lock
+    while True:
+        ids = list(
+            Reading.objects.filter(created_at__lt=cutoff)
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        Reading.objects.filter(id__in=ids).delete()
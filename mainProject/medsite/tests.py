@@ -1,3 +1,322 @@
-from django.test import TestCase
+import gzip
+import time
+import unittest
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, connections, router
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import jobs, routers
+from . import jsoncodec
+from .jsoncodec import loads
+from .models import Job, Patient, Reading
+
+
+@override_settings(DATABASE_ROUTERS=[])
+class LatestApiTests(TestCase):
+    def setUp(self):
+        self.patient = Patient.objects.create(name="Test")
+        now = timezone.now()
+        for i in range(30):
+            r = Reading.objects.create(patient=self.patient, bpm=60 + i, spo2=98.0, finger=True)
+            Reading.objects.filter(pk=r.pk).update(created_at=now - timedelta(seconds=29 - i))
+        self.url = f"/api/latest/{self.patient.public_code}/"
+
+    def test_single_row_by_default(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual(data["bpm"], 89)
+        self.assertNotIn("pi", data)
+
+    def test_rows_oldest_first(self):
+        data = self.client.get(self.url, {"n": 5}).json()
+        self.assertEqual([r["bpm"] for r in data["readings"]], [85, 86, 87, 88, 89])
+
+    def test_column_shape(self):
+        data = self.client.get(self.url, {"n": 3, "shape": "columns"}).json()
+        self.assertEqual(data["bpm"], [87, 88, 89])
+        self.assertEqual(len(data["t"]), 3)
+        self.assertNotIn("created_at", data)
+
+    def test_gzip_when_accepted(self):
+        res = self.client.get(self.url, {"n": 30}, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", res["Vary"])
+        self.assertEqual(len(loads(gzip.decompress(res.content))["readings"]), 30)
+
+    def test_no_compression_without_accept_encoding(self):
+        res = self.client.get(self.url, {"n": 30})
+        self.assertFalse(res.has_header("Content-Encoding"))
+
+    def test_stale_reading_is_unavailable(self):
+        Reading.objects.update(created_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.client.get(self.url).json(), {"detail": "Machine unavailable"})
+
+
+
+@override_settings(DATABASE_ROUTERS=[])
+class JsonBackendTests(TestCase):
+    def setUp(self):
+        self.patient = Patient.objects.create(name="Test")
+
+    def round_trip(self, backend):
+        """Ingest a raw bytes body, then read it back through api_latest."""
+        with override_settings(MEDSITE_JSON_BACKEND=backend):
+            self.assertEqual(jsoncodec.get_backend().name, backend)
+            Reading.objects.all().delete()
+            res = self.client.post(
+                "/api/ingest/",
+                data='{"bpm":72,"spo2":97.5,"finger":"yes","temp":36.6,"ir":123456789012}'.encode("utf-8"),
+                content_type="application/json",
+                headers={"X-PUBLIC-CODE": self.patient.public_code},
+            )
+            self.assertEqual(res.status_code, 200)
+            reading = Reading.objects.get()
+            return reading, self.client.get(f"/api/latest/{self.patient.public_code}/").content
+
+    def test_stdlib_fallback_matches_orjson(self):
+        for backend in ("json", "orjson"):
+            with self.subTest(backend=backend):
+                reading, body = self.round_trip(backend)
+                data = loads(body)
+                self.assertEqual(data["created_at"], reading.created_at.isoformat())
+                self.assertEqual(data["ir"], 123456789012)
+                self.assertIs(data["finger"], True)
+                self.assertEqual(data["spo2"], 97.5)
+
+    def test_stdlib_and_orjson_encode_identically(self):
+        row = {"created_at": timezone.now(), "bpm": 72, "spo2": 97.5, "finger": False, "temp": None}
+        with override_settings(MEDSITE_JSON_BACKEND="json"):
+            stdlib = jsoncodec.dumps(row)
+        with override_settings(MEDSITE_JSON_BACKEND="orjson"):
+            self.assertEqual(jsoncodec.dumps(row), stdlib)
+
+    def test_unknown_backend_is_rejected(self):
+        with override_settings(MEDSITE_JSON_BACKEND="yaml"):
+            with self.assertRaises(ImproperlyConfigured):
+                jsoncodec.get_backend()
+
+
+@routers.replica_reads
+def read_alias_view(request):
+    return HttpResponse(router.db_for_read(Patient))
+
+
+@mock.patch("django.db.router.routers", [routers.PrimaryReplicaRouter()])
+@mock.patch.object(routers, "replica_configured", return_value=True)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def alias_for(self, request):
+        return read_alias_view(request).content.decode()
+
+    @mock.patch.object(routers, "replica_lag", return_value=0.0)
+    def test_reads_go_to_replica_inside_replica_reads(self, *_):
+        self.assertEqual(self.alias_for(self.factory.get("/")), routers.REPLICA)
+        # outside the decorator reads stay on the primary
+        self.assertEqual(router.db_for_read(Patient), routers.PRIMARY)
+
+    @mock.patch.object(routers, "replica_lag", return_value=0.0)
+    def test_pin_cookie_forces_primary(self, *_):
+        request = self.factory.get("/")
+        request.COOKIES[routers.PIN_COOKIE] = "1"
+        self.assertEqual(self.alias_for(request), routers.PRIMARY)
+
+    def test_lagging_replica_falls_back_to_primary(self, *_):
+        with mock.patch.object(routers, "replica_lag", return_value=settings.REPLICA_MAX_LAG_SECONDS + 1):
+            self.assertEqual(self.alias_for(self.factory.get("/")), routers.PRIMARY)
+
+    def test_unreachable_replica_falls_back_to_primary(self, *_):
+        with mock.patch.object(routers, "replica_lag", return_value=None):
+            self.assertEqual(self.alias_for(self.factory.get("/")), routers.PRIMARY)
+
+    def test_writes_always_go_to_primary(self, *_):
+        self.assertEqual(router.db_for_write(Patient), routers.PRIMARY)
+
+
+@unittest.skipUnless("replica" in settings.DATABASES, "set REPLICA_DATABASE_URL to run")
+class ReplicaIntegrationTests(TransactionTestCase):
+    # The replica mirrors "default" in tests (TEST["MIRROR"]) but uses its own
+    # connection, so rows must be committed for it to see them.
+    databases = "__all__"
+
+    def setUp(self):
+        routers.reset_lag_cache()
+        self.patient = Patient.objects.create(name="Test")
+        Reading.objects.create(patient=self.patient, bpm=70)
+
+    def test_mirrored_replica_has_no_lag(self):
+        self.assertEqual(routers.replica_lag(), 0.0)
+
+    def test_write_sets_pin_cookie(self):
+        res = self.client.post(
+            "/api/ingest/", data=b'{"bpm":71}', content_type="application/json",
+            headers={"X-PUBLIC-CODE": self.patient.public_code},
+        )
+        self.assertIn(routers.PIN_COOKIE, res.cookies)
+
+    @mock.patch.object(routers, "replica_lag", return_value=0.0)
+    def test_latest_reads_through_replica(self, _):
+        with CaptureQueriesContext(connections["replica"]) as replica_queries:
+            res = self.client.get(f"/api/latest/{self.patient.public_code}/")
+        self.assertEqual(res.json()["bpm"], 70)
+        self.assertTrue(any("medsite_reading" in q["sql"] for q in replica_queries))
+
+    @mock.patch.object(routers, "replica_lag", return_value=60.0)
+    def test_lagging_replica_is_not_queried(self, _):
+        with CaptureQueriesContext(connections["replica"]) as replica_queries:
+            res = self.client.get(f"/api/latest/{self.patient.public_code}/")
+        self.assertEqual(res.json()["bpm"], 70)
+        self.assertEqual(len(replica_queries), 0)
+
+
+@jobs.job("tests.ok")
+def ok_job(**kwargs):
+    pass
+
+
+@jobs.job("tests.boom", max_attempts=2)
+def boom_job():
+    raise RuntimeError("boom")
+
+
+@jobs.job("tests.slow")
+def slow_job(seconds):
+    time.sleep(seconds)
+
+
+@jobs.job("tests.tick", every=60)
+def tick_job():
+    pass
+
+
+class JobQueueTests(TestCase):
+    def test_conditional_claim_is_won_once(self):
+        j = jobs.enqueue("tests.ok")
+        with mock.patch.object(connection.features, "has_select_for_update_skip_locked", False):
+            first = jobs.claim("worker-a")
+            second = jobs.claim("worker-b")
+
+        self.assertEqual(first.pk, j.pk)
+        self.assertEqual(first.locked_by, "worker-a")
+        self.assertEqual(first.attempts, 1)
+        self.assertIsNone(second)
+
+    def test_future_jobs_are_not_claimed(self):
+        jobs.enqueue("tests.ok", delay=60)
+        self.assertIsNone(jobs.claim("worker-a"))
+
+    def test_success_marks_done(self):
+        j = jobs.enqueue("tests.ok", {"x": 1})
+        self.assertTrue(jobs.run(jobs.claim("worker-a")))
+        j.refresh_from_db()
+        self.assertEqual(j.status, Job.DONE)
+        self.assertIsNotNone(j.finished_at)
+
+    def test_failing_job_retries_then_fails(self):
+        j = jobs.enqueue("tests.boom")
+
+        with self.assertLogs("medsite.jobs", "ERROR"):
+            self.assertFalse(jobs.run(jobs.claim("worker-a")))
+        j.refresh_from_db()
+        self.assertEqual(j.status, Job.QUEUED)
+        self.assertGreater(j.run_at, timezone.now())  # backoff
+        self.assertIn("boom", j.last_error)
+
+        Job.objects.filter(pk=j.pk).update(run_at=timezone.now())
+        with self.assertLogs("medsite.jobs", "ERROR"):
+            jobs.run(jobs.claim("worker-a"))
+        j.refresh_from_db()
+        self.assertEqual(j.status, Job.FAILED)
+        self.assertEqual(j.attempts, 2)
+
+    def test_requeue_stale(self):
+        long_ago = timezone.now() - timedelta(hours=1)
+        retry = jobs.enqueue("tests.ok", max_attempts=3)
+        spent = jobs.enqueue("tests.ok", max_attempts=1)
+        fresh = jobs.enqueue("tests.ok")
+        Job.objects.filter(pk__in=[retry.pk, spent.pk]).update(
+            status=Job.RUNNING, attempts=1, started_at=long_ago, locked_by="dead",
+        )
+        Job.objects.filter(pk=fresh.pk).update(
+            status=Job.RUNNING, attempts=1, started_at=timezone.now(), locked_by="alive",
+        )
+
+        self.assertEqual(jobs.requeue_stale(timeout=60), 2)
+        statuses = dict(Job.objects.values_list("pk", "status"))
+        self.assertEqual(statuses[retry.pk], Job.QUEUED)
+        self.assertEqual(statuses[spent.pk], Job.FAILED)
+        self.assertEqual(statuses[fresh.pk], Job.RUNNING)
+
+    def test_late_finish_does_not_overwrite_new_owner(self):
+        jobs.enqueue("tests.ok")
+        slow = jobs.claim("worker-a")
+        Job.objects.filter(pk=slow.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        jobs.requeue_stale(timeout=60)
+        jobs.claim("worker-b")
+
+        with self.assertLogs("medsite.jobs", "WARNING"):
+            jobs.run(slow)
+        row = Job.objects.get(pk=slow.pk)
+        self.assertEqual(row.status, Job.RUNNING)
+        self.assertEqual(row.locked_by, "worker-b")
+
+    def test_live_heartbeat_is_not_stale(self):
+        j = jobs.enqueue("tests.ok")
+        Job.objects.filter(pk=j.pk).update(
+            status=Job.RUNNING, attempts=1, locked_by="busy",
+            started_at=timezone.now() - timedelta(hours=1), heartbeat_at=timezone.now(),
+        )
+        self.assertEqual(jobs.requeue_stale(timeout=60), 0)
+        self.assertEqual(Job.objects.get(pk=j.pk).status, Job.RUNNING)
+
+    def test_finish_after_timeout_on_last_attempt_is_recorded(self):
+        jobs.enqueue("tests.ok", max_attempts=1)
+        slow = jobs.claim("worker-a")
+        Job.objects.filter(pk=slow.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        jobs.requeue_stale(timeout=60)
+        self.assertEqual(Job.objects.get(pk=slow.pk).status, Job.FAILED)
+
+        self.assertTrue(jobs.run(slow))
+        row = Job.objects.get(pk=slow.pk)
+        self.assertEqual(row.status, Job.DONE)
+        self.assertEqual(row.last_error, "")
+
+    def test_schedule_periodic_is_idempotent_within_slot(self):
+        now = timezone.now()
+        ticks = Job.objects.filter(name="tests.tick")
+
+        jobs.schedule_periodic(now=now)
+        jobs.schedule_periodic(now=now)
+        self.assertEqual(ticks.count(), 1)
+
+        jobs.schedule_periodic(now=now + timedelta(seconds=60))
+        self.assertEqual(ticks.count(), 2)
+
+    def test_schedule_periodic_skips_db_when_slot_unchanged(self):
+        now = timezone.now()
+        last_slots = {}
+        jobs.schedule_periodic(now=now, last_slots=last_slots)
+        with self.assertNumQueries(0):
+            jobs.schedule_periodic(now=now, last_slots=last_slots)
+
+
+class JobHeartbeatTests(TransactionTestCase):
+    # the heartbeat writes from its own thread/connection, so no wrapping transaction
+
+    @override_settings(JOBS_HEARTBEAT_SECONDS=0.05)
+    def test_heartbeat_refreshed_while_running(self):
+        jobs.enqueue("tests.slow", {"seconds": 0.4})
+        j = jobs.claim("worker-a")
+        self.assertTrue(jobs.run(j))
+        row = Job.objects.get(pk=j.pk)
+        self.assertEqual(row.status, Job.DONE)
+        self.assertGreater(row.heartbeat_at, row.started_at)
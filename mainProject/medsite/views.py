@@ -1,5 +1,4 @@
 # medsite/views.py
-import json
 from datetime import timedelta
 
 from django.contrib.auth import login, logout
@@ -12,7 +11,12 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_GET, require_POST
 from django.conf import settings
 from .forms import PatientForm, RegisterForm
+from .jsoncodec import (
+    PUBLIC_READING_FIELDS, READING_FIELDS, FastJsonResponse, loads,
+    reading_to_dict, readings_to_columns, readings_to_rows,
+)
 from .models import Patient, Reading
+from .routers import replica_reads
 from django.urls import reverse
 
 
@@ -30,7 +34,37 @@ def to_bool(v):
     return False
 
 
+MAX_LATEST_ROWS = 600  # ten minutes of 1 Hz readings
+
+
+def latest_readings_response(request, patient, fields):
+    """
+    Latest reading as one object. `?n=<rows>` returns the last n readings
+    (oldest first) as {"readings": [...]}, or with `?shape=columns` as
+    {"t": [...], "bpm": [...], ...}. Multi-row responses are gzip/brotli
+    compressed when the client accepts it.
+    """
+    try:
+        n = max(1, min(int(request.GET.get("n", 1)), MAX_LATEST_ROWS))
+    except ValueError:
+        n = 1
+    columns = request.GET.get("shape", "").strip().lower() == "columns"
+
+    rows = list(patient.readings.order_by("-created_at")[:n])
+    if not rows or (timezone.now() - rows[0].created_at > timedelta(seconds=5)):
+        return JsonResponse({"detail": "Machine unavailable"}, status=200)
+
+    if n == 1 and not columns:
+        return FastJsonResponse(reading_to_dict(rows[0], fields), request=request)
+
+    rows.reverse()
+    if columns:
+        return FastJsonResponse(readings_to_columns(rows, fields), request=request)
+    return FastJsonResponse({"readings": readings_to_rows(rows, fields)}, request=request)
+
+
 # ---------------- pages ----------------
+@replica_reads
 def home(request):
     esp32_url = ""
 
@@ -91,11 +125,13 @@ def create_patient(request):
     return render(request, "medsite/create_patient.html", {"form": form})
 
 
+@replica_reads
 @login_required
 def patient_detail(request, patient_id):
     patient = get_object_or_404(Patient, id=patient_id, doctor=request.user)
     return render(request, "medsite/patient_detail.html", {"patient": patient})
 
+@replica_reads
 @require_GET
 def public_monitor(request, public_code):
     patient = get_object_or_404(Patient, public_code=public_code)
@@ -117,6 +153,7 @@ def public_monitor(request, public_code):
         "can_view_private": can_view_private,
     })
 
+@replica_reads
 @login_required
 def stats_page(request, patient_id):
     patient = get_object_or_404(
@@ -127,38 +164,19 @@ def stats_page(request, patient_id):
 
 
 # ---------------- APIs ----------------
+@replica_reads
 @login_required
 def api_latest_patient(request, patient_id):
     patient = get_object_or_404(
         Patient, id=patient_id, doctor=request.user, is_archived=False
     )
+    return latest_readings_response(request, patient, READING_FIELDS)
 
-    r = patient.readings.order_by("-created_at").first()
-    if not r or (timezone.now() - r.created_at > timedelta(seconds=5)):
-        return JsonResponse({"detail": "Machine unavailable"}, status=200)
-
-    return JsonResponse({
-        "created_at": r.created_at.isoformat(),
-        "ir": r.ir, "red": r.red, "finger": r.finger,
-        "bpm": r.bpm, "spo2": r.spo2, "pi": r.pi, "rr": r.rr,
-        "sbp": r.sbp, "dbp": r.dbp, "temp": r.temp,
-    })
-
+@replica_reads
 @require_GET
 def api_latest(request, public_code):
     patient = get_object_or_404(Patient, public_code=public_code)
-
-    r = patient.readings.order_by("-created_at").first()
-    if not r or (timezone.now() - r.created_at > timedelta(seconds=5)):
-        return JsonResponse({"detail": "Machine unavailable"}, status=200)
-
-    return JsonResponse({
-        "created_at": r.created_at.isoformat(),
-        "ir": r.ir, "red": r.red, "finger": r.finger,
-        "bpm": r.bpm, "spo2": r.spo2,
-        "sbp": r.sbp, "dbp": r.dbp,
-        "temp": r.temp,
-    })
+    return latest_readings_response(request, patient, PUBLIC_READING_FIELDS)
 
 @csrf_exempt
 @require_POST
@@ -182,7 +200,7 @@ def api_ingest(request):
         return JsonResponse({"detail": "Invalid patient code"}, status=403)
 
     try:
-        payload = json.loads(request.body.decode("utf-8"))
+        payload = loads(request.body)
         if not isinstance(payload, dict):
             raise ValueError("JSON must be an object")
     except Exception: